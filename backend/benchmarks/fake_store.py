@@ -0,0 +1,297 @@
+"""
+In-process stand-in for the subset of the Firestore client API used by
+the routers, plus a proxy that counts store round-trips for any client
+(fake or real, e.g. pointed at the Firestore emulator).
+"""
+import copy
+import itertools
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from google.api_core.exceptions import Conflict, FailedPrecondition, NotFound
+from google.cloud.firestore_v1.transforms import DELETE_FIELD, Increment
+
+
+# ----------------------------
+# ROUND-TRIP COUNTING
+# ----------------------------
+class RoundTripCounter:
+    """Counts store round-trips; optionally sleeps to simulate network RTT."""
+
+    def __init__(self, latency_ms=0.0):
+        self._lock = threading.Lock()
+        self._latency = latency_ms / 1000.0
+        self.count = 0
+
+    def hit(self):
+        with self._lock:
+            self.count += 1
+        if self._latency:
+            time.sleep(self._latency)
+
+    def reset(self):
+        with self._lock:
+            value, self.count = self.count, 0
+        return value
+
+
+# Calls that reach the backend vs. calls that only build references/queries
+_ROUND_TRIP_CALLS = {"get", "set", "create", "update", "delete", "add", "stream", "get_all", "commit"}
+_CHAINED_CALLS = {"collection", "document", "where", "order_by", "limit", "batch"}
+# Write batches only reach the store on commit()
+_BATCH_ROUND_TRIP_CALLS = {"commit"}
+
+
+class CountingProxy:
+    """Wraps a Firestore client and counts every call that hits the store."""
+
+    def __init__(self, target, counter, round_trip_calls=_ROUND_TRIP_CALLS):
+        self._target = target
+        self._counter = counter
+        self._round_trip_calls = round_trip_calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        if name in self._round_trip_calls:
+            def call(*args, **kwargs):
+                self._counter.hit()
+                return attr(*_unwrap(args), **kwargs)
+            return call
+        if name in _CHAINED_CALLS:
+            calls = _BATCH_ROUND_TRIP_CALLS if name == "batch" else _ROUND_TRIP_CALLS
+
+            def chain(*args, **kwargs):
+                return CountingProxy(attr(*_unwrap(args), **kwargs), self._counter, calls)
+            return chain
+
+        def passthrough(*args, **kwargs):
+            return attr(*_unwrap(args), **kwargs)
+        return passthrough
+
+
+def _unwrap(args):
+    out = []
+    for a in args:
+        if isinstance(a, CountingProxy):
+            a = a._target
+        elif isinstance(a, (list, tuple)):
+            a = [x._target if isinstance(x, CountingProxy) else x for x in a]
+        out.append(a)
+    return out
+
+
+# ----------------------------
+# FAKE FIRESTORE
+# ----------------------------
+class FakeSnapshot:
+    def __init__(self, doc_id, data, reference=None, update_time=None):
+        self.id = doc_id
+        self._data = data
+        self.reference = reference
+        # A per-document write counter stands in for the server timestamp
+        self.update_time = update_time
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+def _apply(target, data, merge):
+    """Write data into target, honouring DELETE_FIELD, Increment and nested merges."""
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, Increment):
+            target[key] = (target.get(key) or 0) + value.value
+        elif merge and isinstance(value, dict) and isinstance(target.get(key), dict):
+            _apply(target[key], value, merge)
+        elif isinstance(value, dict):
+            target[key] = {}
+            _apply(target[key], value, merge)
+        else:
+            target[key] = copy.deepcopy(value)
+
+
+class FakeDocument:
+    def __init__(self, store, collection, doc_id):
+        self._store = store
+        self._collection = collection
+        self.id = doc_id
+
+    def _docs(self):
+        return self._store._collections.setdefault(self._collection, {})
+
+    def _version(self):
+        return self._store._versions.get((self._collection, self.id))
+
+    def _touch(self):
+        self._store._versions[(self._collection, self.id)] = next(self._store._clock)
+
+    def get(self):
+        with self._store._lock:
+            data = self._docs().get(self.id)
+            return FakeSnapshot(self.id, copy.deepcopy(data), self, self._version())
+
+    def set(self, data, merge=False):
+        with self._store._lock:
+            docs = self._docs()
+            if not (merge and self.id in docs):
+                docs[self.id] = {}
+            _apply(docs[self.id], data, merge)
+            self._touch()
+
+    def create(self, data):
+        with self._store._lock:
+            if self.id in self._docs():
+                raise Conflict(f"Document already exists: {self._collection}/{self.id}")
+            self.set(data)
+
+    def update(self, data, option=None):
+        with self._store._lock:
+            docs = self._docs()
+            if self.id not in docs:
+                raise NotFound(f"No document to update: {self._collection}/{self.id}")
+            expected = getattr(option, "last_update_time", None)
+            if expected is not None and expected != self._version():
+                raise FailedPrecondition(f"Document changed since {expected}: {self._collection}/{self.id}")
+            _apply(docs[self.id], data, merge=False)
+            self._touch()
+
+    def delete(self):
+        with self._store._lock:
+            self._docs().pop(self.id, None)
+            self._store._versions.pop((self._collection, self.id), None)
+
+
+class FakeQuery:
+    _OPS = {
+        "==": lambda a, b: a == b,
+        "!=": lambda a, b: a != b,
+        "<": lambda a, b: a is not None and a < b,
+        "<=": lambda a, b: a is not None and a <= b,
+        ">": lambda a, b: a is not None and a > b,
+        ">=": lambda a, b: a is not None and a >= b,
+        "in": lambda a, b: a in b,
+        "not-in": lambda a, b: a not in b,
+        "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    }
+
+    def __init__(self, store, collection, filters=(), orders=(), limit_to=None):
+        self._store = store
+        self._collection = collection
+        self._filters = list(filters)
+        self._orders = list(orders)
+        self._limit = limit_to
+
+    def _copy(self, **changes):
+        q = FakeQuery(self._store, self._collection, self._filters, self._orders, self._limit)
+        for k, v in changes.items():
+            setattr(q, k, v)
+        return q
+
+    def where(self, filter=None):
+        # google.cloud.firestore And(...) composites expose .filters
+        filters = getattr(filter, "filters", None) or [filter]
+        return self._copy(_filters=self._filters + list(filters))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(_orders=self._orders + [(field_path, direction)])
+
+    def limit(self, count):
+        return self._copy(_limit=count)
+
+    def _matches(self, data):
+        for f in self._filters:
+            if f.field_path not in data:
+                return False
+            if not self._OPS[f.op_string](data.get(f.field_path), f.value):
+                return False
+        return True
+
+    def stream(self):
+        with self._store._lock:
+            docs = self._store._collections.get(self._collection, {})
+            versions = self._store._versions
+            rows = [
+                (doc_id, copy.deepcopy(d), versions.get((self._collection, doc_id)))
+                for doc_id, d in docs.items() if self._matches(d)
+            ]
+        for field, direction in reversed(self._orders):
+            rows = [r for r in rows if field in r[1]]
+            rows.sort(key=lambda r: r[1][field], reverse=str(direction).upper() == "DESCENDING")
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return iter([
+            FakeSnapshot(doc_id, d, FakeDocument(self._store, self._collection, doc_id), version)
+            for doc_id, d, version in rows
+        ])
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, store, name):
+        super().__init__(store, name)
+
+    def document(self, doc_id=None):
+        return FakeDocument(self._store, self._collection, doc_id or uuid.uuid4().hex)
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return datetime.utcnow(), ref
+
+
+class FakeWriteBatch:
+    def __init__(self):
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(lambda: ref.set(data, merge=merge))
+
+    def update(self, ref, data):
+        self._ops.append(lambda: ref.update(data))
+
+    def delete(self, ref):
+        self._ops.append(ref.delete)
+
+    def commit(self):
+        for op in self._ops:
+            op()
+        self._ops = []
+
+
+class FakeWriteOption:
+    def __init__(self, last_update_time=None):
+        self.last_update_time = last_update_time
+
+
+class FakeFirestore:
+    def __init__(self):
+        self._collections = {}
+        self._versions = {}
+        self._clock = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def get_all(self, references):
+        # Firestore does not guarantee result order; reverse it so callers
+        # that depend on request order show up wrong in benchmark runs.
+        for ref in reversed(list(references)):
+            yield ref.get()
+
+    def batch(self):
+        return FakeWriteBatch()
+
+    def write_option(self, **kwargs):
+        return FakeWriteOption(**kwargs)
+
+    def count(self, collection):
+        return len(self._collections.get(collection, {}))
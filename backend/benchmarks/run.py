@@ -0,0 +1,300 @@
+"""
+TaskGuru API benchmark runner.
+
+Runs the scripted scenarios in benchmarks/scenarios.py in-process against
+the FastAPI app, with Firestore replaced by an in-memory fake (default) or
+the local Firestore emulator, and outgoing mail delivered to a local SMTP
+sink. Nothing leaves the machine.
+
+Usage (from backend/):
+    python -m benchmarks.run
+    python -m benchmarks.run --iterations 500 --store-latency-ms 5
+    python -m benchmarks.run --scenario create_storm --concurrency 16 --store-latency-ms 5
+    python -m benchmarks.run --scenario dashboard_load --compare benchmarks/results/old.json
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.run --store emulator
+
+Results are written as JSON (benchmarks/results/<timestamp>_<commit>.json
+by default) so runs can be compared across commits.
+
+With --concurrency > 1 the timed steps run from a pool of client threads.
+Store round-trips and emails can then no longer be attributed to single
+requests, so they are reported per scenario (total / requests) only.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.fake_store import CountingProxy, FakeFirestore, RoundTripCounter
+from benchmarks.scenarios import SCENARIOS
+from benchmarks.smtp_sink import SMTPSink
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+# ----------------------------
+# STATS
+# ----------------------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    # Nearest-rank
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples, wall_seconds, totals=None):
+    """
+    Latency stats for samples; throughput is requests over wall_seconds.
+    Round-trips and emails come from the samples, or from `totals` when
+    they could not be attributed per request (concurrent runs).
+    """
+    latencies = sorted(s["ms"] for s in samples)
+    if totals is None and all(s["round_trips"] is not None for s in samples):
+        trips = [s["round_trips"] for s in samples]
+        round_trips = {"mean": round(sum(trips) / len(trips), 2), "max": max(trips)}
+        emails = sum(s["emails"] for s in samples)
+    elif totals is not None:
+        round_trips = {"mean": round(totals["round_trips"] / len(samples), 2), "max": None}
+        emails = totals["emails"]
+    else:
+        round_trips = {"mean": None, "max": None}
+        emails = None
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if s["status"] >= 500),
+        "throughput_rps": round(len(samples) / wall_seconds, 2) if wall_seconds else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "max": round(latencies[-1], 3),
+        },
+        "round_trips_per_request": round_trips,
+        "emails_sent": emails,
+    }
+
+
+# ----------------------------
+# HARNESS
+# ----------------------------
+class Bench:
+    def __init__(self, app, counter, sink):
+        self.app = app
+        self.counter = counter
+        self.sink = sink
+        self.samples = []
+        # Round-trips/emails are global counters: only attributable per
+        # request while a single request is in flight
+        self.per_request = True
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # One TestClient per worker thread
+        client = getattr(self._local, "client", None)
+        if client is None:
+            from fastapi.testclient import TestClient
+            client = self._local.client = TestClient(self.app)
+        return client
+
+    def call(self, label, method, url, record=True, **kwargs):
+        if self.per_request:
+            self.counter.reset()
+            self.sink.reset()
+        start = time.perf_counter()
+        resp = self.client.request(method.upper(), url, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if record:
+            sample = {
+                "endpoint": label,
+                "status": resp.status_code,
+                "ms": elapsed_ms,
+                "round_trips": self.counter.reset() if self.per_request else None,
+                "emails": self.sink.reset() if self.per_request else None,
+            }
+            with self._lock:
+                self.samples.append(sample)
+        return resp
+
+    def run_steps(self, step, state, iterations, concurrency):
+        """Run the timed steps and return their wall time in seconds."""
+        self.per_request = concurrency <= 1
+        self.counter.reset()
+        self.sink.reset()
+        start = time.perf_counter()
+        if concurrency <= 1:
+            for i in range(iterations):
+                step(self, state, i)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                # list() re-raises any exception from a step
+                list(pool.map(lambda i: step(self, state, i), range(iterations)))
+        return time.perf_counter() - start
+
+
+def _configure_environment(sink_host, sink_port, digest_window):
+    # Must run before the app is imported: the services read these at import.
+    # An empty FIREBASE_CRED_PATH keeps load_dotenv() from pointing us at a
+    # real project.
+    os.environ["FIREBASE_CRED_PATH"] = ""
+    os.environ["SMTP_SERVER"] = sink_host
+    os.environ["SMTP_PORT"] = str(sink_port)
+    os.environ["SMTP_STARTTLS"] = "false"
+    os.environ["SENDER_EMAIL"] = "bench@taskguru.local"
+    os.environ["SENDER_PASSWORD"] = "bench"
+    os.environ["EMAIL_DIGEST_WINDOW_SECONDS"] = str(digest_window)
+
+
+def _install_store(store):
+    """Point every router/service module-level `db` at the given store."""
+    for name, module in list(sys.modules.items()):
+        if name.startswith(("routers.", "services.")) and hasattr(module, "db"):
+            module.db = store
+
+
+def _new_store(kind):
+    if kind == "fake":
+        return FakeFirestore()
+
+    from google.cloud import firestore
+    host = os.getenv("FIRESTORE_EMULATOR_HOST")
+    if not host:
+        raise SystemExit("--store emulator needs FIRESTORE_EMULATOR_HOST (e.g. localhost:8080)")
+    project = os.getenv("FIRESTORE_PROJECT", "taskguru-bench")
+    # Wipe the emulator so every scenario starts from the same state
+    urllib.request.urlopen(urllib.request.Request(
+        f"http://{host}/emulator/v1/projects/{project}/databases/(default)/documents",
+        method="DELETE",
+    )).close()
+    return firestore.Client(project=project)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📊 Compared with {baseline_path} ({baseline['meta'].get('commit')})")
+    for scenario, result in current["scenarios"].items():
+        old = baseline["scenarios"].get(scenario)
+        if not old:
+            continue
+        for endpoint, stats in result["endpoints"].items():
+            prev = old["endpoints"].get(endpoint)
+            if not prev:
+                continue
+            p50, p50_old = stats["latency_ms"]["p50"], prev["latency_ms"]["p50"]
+            p95, p95_old = stats["latency_ms"]["p95"], prev["latency_ms"]["p95"]
+            rt, rt_old = stats["round_trips_per_request"]["mean"], prev["round_trips_per_request"]["mean"]
+            trips = f"  trips {rt_old:6.2f} → {rt:6.2f}" if rt is not None and rt_old is not None else ""
+            print(f"  {scenario:22} {endpoint:32} p50 {p50_old:8.2f} → {p50:8.2f} ms"
+                  f"  p95 {p95_old:8.2f} → {p95:8.2f} ms{trips}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TaskGuru API benchmarks")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Client threads issuing the timed steps in parallel")
+    parser.add_argument("--store", choices=["fake", "emulator"], default="fake")
+    parser.add_argument("--store-latency-ms", type=float, default=0.0,
+                        help="Simulated network latency per store round-trip")
+    parser.add_argument("--digest-window", type=int, default=0,
+                        help="EMAIL_DIGEST_WINDOW_SECONDS for the run (0 = send immediately)")
+    parser.add_argument("--output", help="Result JSON path")
+    parser.add_argument("--compare", help="Earlier result JSON to diff against")
+    args = parser.parse_args(argv)
+
+    sink = SMTPSink().start()
+    _configure_environment(*sink.address, args.digest_window)
+
+    from main import app
+    from services.cache_service import clear_task_cache
+    from services.email_service import flush_digests
+
+    counter = RoundTripCounter(args.store_latency_ms)
+    results = {}
+
+    for name in args.scenario or list(SCENARIOS):
+        _install_store(CountingProxy(_new_store(args.store), counter))
+        clear_task_cache()
+        bench = Bench(app, counter, sink)
+        setup, step = SCENARIOS[name]
+        state = setup(bench)
+        wall = bench.run_steps(step, state, args.iterations, args.concurrency)
+        totals = None if bench.per_request else {
+            "round_trips": counter.reset(),
+            "emails": sink.reset(),
+        }
+        # Digests still queued at the end of the scenario are sent untimed
+        sink.reset()
+        flush_digests(force=True)
+        digest_emails = sink.reset()
+
+        by_endpoint = {}
+        for s in bench.samples:
+            by_endpoint.setdefault(s["endpoint"], []).append(s)
+        results[name] = {
+            **summarize(bench.samples, wall, totals),
+            "wall_seconds": round(wall, 3),
+            "concurrency": args.concurrency,
+            "digest_emails_flushed": digest_emails,
+            "endpoints": {ep: summarize(ss, wall) for ep, ss in by_endpoint.items()},
+        }
+        r = results[name]
+        print(f"🏁 {name:22} {r['requests']:6} req  p50 {r['latency_ms']['p50']:8.2f} ms"
+              f"  p95 {r['latency_ms']['p95']:8.2f} ms  p99 {r['latency_ms']['p99']:8.2f} ms"
+              f"  {r['throughput_rps']:9.1f} req/s  trips/req {r['round_trips_per_request']['mean']:.2f}")
+
+    sink.stop()
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "store": args.store,
+            "store_latency_ms": args.store_latency_ms,
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "digest_window_seconds": args.digest_window,
+        },
+        "scenarios": results,
+    }
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}_{commit}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\n💾 Results saved to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
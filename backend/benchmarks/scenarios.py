@@ -0,0 +1,110 @@
+"""
+Scripted load scenarios. Each scenario is a (setup, step) pair: setup(bench)
+seeds what it needs through the API (untimed) and returns shared state, then
+step(bench, state, i) is timed once per iteration. With --concurrency > 1
+steps run from several threads at once, so they must not depend on order.
+"""
+OWNER = "owner@bench.local"
+
+
+def _create_task(bench, title, email=OWNER):
+    resp = bench.call("POST /tasks/create", "post", "/tasks/create", record=False, json={
+        "title": title,
+        "description": "benchmark task",
+        "due_date": "2030-01-01",
+        "priority": "normal",
+        "user_email": email,
+    })
+    return resp.json()["task_id"]
+
+
+def _seed_dashboard(bench, tasks=50, notifications=20):
+    bench.call("POST /auth/register", "post", "/auth/register", record=False,
+               json={"email": OWNER, "password": "bench"})
+    task_ids = [_create_task(bench, f"Seed task {i}") for i in range(tasks)]
+    for i in range(notifications):
+        bench.call("POST /tasks/request_access", "post",
+                   f"/tasks/request_access/{task_ids[i % len(task_ids)]}",
+                   record=False, json={"user_email": f"seed{i}@bench.local"})
+    return task_ids
+
+
+# ----------------------------
+# SCENARIOS
+# ----------------------------
+def _no_setup(bench):
+    return None
+
+
+def dashboard_load(bench, state, i):
+    """What Dashboard.jsx fetches on every page load."""
+    bench.call("GET /auth/user-info", "get", "/auth/user-info", params={"email": OWNER})
+    bench.call("GET /tasks/list", "get", "/tasks/list", params={"email": OWNER})
+    bench.call("GET /auth/notifications", "get", "/auth/notifications", params={"email": OWNER})
+
+
+def dashboard_view(bench, state, i):
+    """Same page as dashboard_load, served by the materialized GET /dashboard."""
+    bench.call("GET /dashboard", "get", "/dashboard", params={"email": OWNER})
+
+
+def create_storm(bench, state, i):
+    bench.call("POST /tasks/create", "post", "/tasks/create", json={
+        "title": f"Storm task {i}",
+        "due_date": "2030-01-01",
+        "user_email": OWNER,
+    })
+
+
+def create_retries(bench, state, i):
+    """Frontend retry after a timeout: same Idempotency-Key sent twice."""
+    for _ in range(2):
+        bench.call("POST /tasks/create (idempotent)", "post", "/tasks/create",
+                   headers={"Idempotency-Key": f"bench-create-{i}"}, json={
+                       "title": f"Retried task {i}",
+                       "due_date": "2030-01-01",
+                       "user_email": OWNER,
+                   })
+
+
+def _setup_subtasks(bench, subtasks=10):
+    task_id = _create_task(bench, "Subtask host")
+    sub_ids = []
+    for i in range(subtasks):
+        resp = bench.call("POST /tasks/subtask/add", "post", "/tasks/subtask/add", record=False,
+                          json={"title": f"Sub {i}", "parent_task_id": task_id})
+        sub_ids.append(resp.json()["subtask_id"])
+    return task_id, sub_ids
+
+
+def subtask_toggling(bench, state, i):
+    task_id, sub_ids = state
+    bench.call("PUT /tasks/subtask/complete", "put",
+               f"/tasks/subtask/complete/{task_id}/{sub_ids[i % len(sub_ids)]}")
+
+
+def share_approve(bench, task_id, i):
+    collaborator = f"collab{i}@bench.local"
+    bench.call("POST /tasks/share_task", "post", f"/tasks/share_task/{task_id}",
+               json={"shared_with": collaborator})
+    bench.call("POST /tasks/approve_access", "post", f"/tasks/approve_access/{task_id}",
+               json={"approver_email": OWNER, "user_email": collaborator})
+
+
+def notification_polling(bench, state, i):
+    """Dashboard.jsx polls notifications every 30 seconds per open tab."""
+    bench.call("GET /auth/notifications", "get", "/auth/notifications", params={"email": OWNER})
+
+
+SCENARIOS = {
+    "dashboard_load": (_seed_dashboard, dashboard_load),
+    "dashboard_view": (_seed_dashboard, dashboard_view),
+    "create_storm": (_no_setup, create_storm),
+    "create_retries": (_no_setup, create_retries),
+    "subtask_toggling": (_setup_subtasks, subtask_toggling),
+    "share_approve": (lambda bench: _create_task(bench, "Shared task"), share_approve),
+    "notification_polling": (
+        lambda bench: _seed_dashboard(bench, tasks=10, notifications=50),
+        notification_polling,
+    ),
+}
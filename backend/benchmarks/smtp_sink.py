@@ -0,0 +1,67 @@
+"""
+Minimal local SMTP server that accepts and discards every message.
+Just enough of RFC 5321 for smtplib.send_message() without STARTTLS/AUTH.
+"""
+import socketserver
+import threading
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self._reply("220 taskguru-bench SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            verb = line.decode("utf-8", "replace").strip().split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 taskguru-bench")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.sink.record()
+                self._reply("250 OK: queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = _Server((host, port), _SinkHandler)
+        self._server.sink = self
+        self._lock = threading.Lock()
+        self.messages = 0
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def record(self):
+        with self._lock:
+            self.messages += 1
+
+    def reset(self):
+        with self._lock:
+            value, self.messages = self.messages, 0
+        return value
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
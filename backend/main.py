@@ -4,6 +4,11 @@ from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from routers.auth import router as auth_router
 from routers.tasks import router as tasks_router
+from routers.admin import router as admin_router
+from routers.dashboard import router as dashboard_router
+from services.archive_service import start_compaction_worker, stop_compaction_worker
+from services.email_service import flush_digests
+from services.profiling_service import PROFILING_ENABLED, profiling_middleware
 from dotenv import load_dotenv
 import os
 import sys
@@ -32,6 +37,10 @@ app.add_middleware(
     allow_headers=["*"],           # 👈 allows custom headers (e.g. JSON)
 )
 
+# 🔬 Opt-in request profiling (see services/profiling_service.py); not installed unless configured
+if PROFILING_ENABLED:
+    app.middleware("http")(profiling_middleware)
+
 # --- Pydantic Data Models (matches frontend types) ---
 class TaskCreate(BaseModel):
     title: str = Field(..., min_length=1)
@@ -86,6 +95,20 @@ async def update_task(task_id: int, update_data: dict, current_user: dict = Depe
 # ✅ Existing router includes, cleaned up
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(tasks_router, prefix="/tasks", tags=["Tasks"])
+app.include_router(dashboard_router, prefix="/dashboard", tags=["Dashboard"])
+app.include_router(admin_router, prefix="/admin", tags=["Admin"])
+
+# 🧹 Background archival of completed tasks / expiry of old notifications
+@app.on_event("startup")
+def start_background_jobs():
+    start_compaction_worker()
+
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    stop_compaction_worker()
+    # Don't drop collaboration emails still waiting for their digest window
+    flush_digests(force=True)
 
 # ----------------------------
 # Debug: Show loaded modules and routers
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import PlainTextResponse
+from services.profiling_service import token_matches, list_profiles, get_profile
+
+router = APIRouter(tags=["Admin"])
+
+
+def _check_admin(token):
+    if not token_matches(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+# ----------------------------
+# REQUEST PROFILES
+# ----------------------------
+@router.get("/profiles")
+def get_profiles(x_admin_token: str | None = Header(default=None)):
+    _check_admin(x_admin_token)
+    return {"profiles": list_profiles()}
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile_detail(profile_id: str, top: int = 20, x_admin_token: str | None = Header(default=None)):
+    _check_admin(x_admin_token)
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.summary() | {
+        "top_stacks": [
+            {"stack": stack.split(";"), "samples": count}
+            for stack, count in profile.stacks.most_common(top)
+        ]
+    }
+
+
+@router.get("/profiles/{profile_id}/folded", response_class=PlainTextResponse)
+def get_profile_folded(profile_id: str, x_admin_token: str | None = Header(default=None)):
+    _check_admin(x_admin_token)
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.folded()
@@ -2,11 +2,13 @@ from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from services.firebase_service import db
 from services.email_service import send_email
+from services.dashboard_service import set_dashboard_user
 from datetime import datetime
 import uuid
 from google.cloud.firestore import FieldFilter  # Added import
+from services.profiling_service import ProfiledRoute
 
-router = APIRouter(tags=["Authentication"])
+router = APIRouter(tags=["Authentication"], route_class=ProfiledRoute)
 
 # ----------------------------
 # MODELS
@@ -43,6 +45,7 @@ def register_user(data: RegisterRequest):
         "created_at": datetime.utcnow().isoformat(),
     }
     db.collection("users").document(user_id).set(user_data)
+    set_dashboard_user(user_id, user_data)
     return {"message": "✅ User registered successfully", "user_id": user_id}
 
 
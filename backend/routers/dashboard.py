@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Query
+from services.profiling_service import ProfiledRoute
+from services.dashboard_service import get_dashboard
+
+router = APIRouter(tags=["Dashboard"], route_class=ProfiledRoute)
+
+
+# ----------------------------
+# DASHBOARD VIEW
+# ----------------------------
+@router.get("")
+def dashboard(email: str = Query(...)):
+    return get_dashboard(email.strip().lower())
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, HTTPException, Body, Query
+from fastapi import APIRouter, HTTPException, Body, Query, Header
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timezone, timedelta
 from services.firebase_service import db
-from services.email_service import send_email
+from services.email_service import notify_email
+from services.cache_service import get_cached_task, cache_task, invalidate_task, task_generation
+from services.archive_service import ARCHIVE_COLLECTION, tombstone_cutoff, restore_task
+from services.dashboard_service import upsert_task_summary, remove_task_summary, adjust_unread
+from services.idempotency_service import run_idempotent
 import uuid
 from google.cloud.firestore import FieldFilter  # Added import
+from services.profiling_service import ProfiledRoute
 
-router = APIRouter(tags=["Tasks"])
+router = APIRouter(tags=["Tasks"], route_class=ProfiledRoute)
 
 # ----------------------------
 # MODELS
@@ -38,13 +43,54 @@ class UpdateSubtask(BaseModel):
     done: bool = None
 
 
+class BatchGetRequest(BaseModel):
+    task_ids: list[str]
+
+
+# Firestore get_all() is one round-trip per call; keep each call to a
+# bounded number of document references.
+BATCH_GET_CHUNK_SIZE = 100
+BATCH_GET_MAX_IDS = 500
+
+# updated_at is stamped before a write commits and worker clocks drift, so
+# /tasks/sync hands out a watermark this far in the past. Clients may see
+# the same change twice and must merge results by id.
+SYNC_WATERMARK_LAG_SECONDS = 10
+
+
+def _load_task_for_write(task_id):
+    """
+    Return (ref, snapshot, archived) for a task about to be written. Archived
+    tasks are read from the archive and only moved back into "tasks" by
+    _write_task(), so a request that fails validation leaves them archived.
+    """
+    task_ref = db.collection("tasks").document(task_id)
+    doc = task_ref.get()
+    if doc.exists:
+        return task_ref, doc, False
+    archived_doc = db.collection(ARCHIVE_COLLECTION).document(task_id).get()
+    return task_ref, archived_doc, archived_doc.exists
+
+
+def _write_task(task_ref, archived, changes):
+    if archived:
+        restore_task(task_ref.id, changes)
+    else:
+        task_ref.update(changes)
+
+
 # ----------------------------
 # CREATE TASK
 # ----------------------------
 @router.post("/create")
-def create_task(task: TaskCreate):
+def create_task(task: TaskCreate, idempotency_key: str | None = Header(default=None, alias="Idempotency-Key")):
+    return run_idempotent("create_task", idempotency_key, task.dict(), lambda: _create_task(task))
+
+
+def _create_task(task: TaskCreate):
     try:
         task_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
         task_data = {
             "task_id": task_id,
             "title": task.title,
@@ -53,11 +99,13 @@ def create_task(task: TaskCreate):
             "due_date": task.due_date,
             "user_email": task.user_email,
             "done": False,
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": now,
+            "updated_at": now,
             "subtasks": [],
         }
 
         db.collection("tasks").document(task_id).set(task_data)
+        upsert_task_summary(task_id, task_data)
 
         return JSONResponse(
             status_code=200,
@@ -76,7 +124,7 @@ def create_task(task: TaskCreate):
 # LIST TASKS
 # ----------------------------
 @router.get("/list")
-def list_tasks(email: str | None = None, only_open: bool = False):
+def list_tasks(email: str | None = None, only_open: bool = False, include_archived: bool = False):
     q = db.collection("tasks")
     if email:
         # Fixed: Using FieldFilter with filter= keyword
@@ -90,20 +138,135 @@ def list_tasks(email: str | None = None, only_open: bool = False):
         d = t.to_dict()
         d["id"] = t.id
         results.append(d)
+
+    # Archived tasks are always done, so they never match only_open
+    if include_archived and not only_open:
+        aq = db.collection(ARCHIVE_COLLECTION)
+        if email:
+            aq = aq.where(filter=FieldFilter("user_email", "==", email))
+        for t in aq.stream():
+            d = t.to_dict()
+            d["id"] = t.id
+            results.append(d)
     return {"tasks": results}
 
 
+# ----------------------------
+# DELTA SYNC
+# ----------------------------
+# Declared before GET /{task_id} so "sync" is not treated as a task id.
+# Needs composite indexes on tasks (user_email, updated_at) and
+# task_tombstones (user_email, deleted_at).
+@router.get("/sync")
+def sync_tasks(email: str | None = None, since: str | None = None):
+    # Lagged so writes stamped just before this query but not yet visible to
+    # it are re-sent next time
+    watermark = (datetime.utcnow() - timedelta(seconds=SYNC_WATERMARK_LAG_SECONDS)).isoformat()
+
+    if since:
+        try:
+            since_dt = datetime.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid 'since' timestamp")
+        # Stored timestamps are naive UTC isoformat strings
+        if since_dt.tzinfo:
+            since_dt = since_dt.astimezone(timezone.utc).replace(tzinfo=None)
+        since = since_dt.isoformat()
+        # Tombstones older than the retention window are gone, resync fully
+        if since < tombstone_cutoff():
+            since = None
+
+    q = db.collection("tasks")
+    if email:
+        q = q.where(filter=FieldFilter("user_email", "==", email))
+    if since:
+        q = q.where(filter=FieldFilter("updated_at", ">", since))
+
+    changed = []
+    for t in q.stream():
+        d = t.to_dict()
+        d["id"] = t.id
+        changed.append(d)
+
+    deleted = []
+    if since:
+        tq = db.collection("task_tombstones")
+        if email:
+            tq = tq.where(filter=FieldFilter("user_email", "==", email))
+        tq = tq.where(filter=FieldFilter("deleted_at", ">", since))
+        deleted = [t.id for t in tq.stream()]
+
+    return {
+        "tasks": changed,
+        "deleted": deleted,
+        "full": not since,
+        "watermark": watermark,
+    }
+
+
+# ----------------------------
+# BATCH GET TASKS
+# ----------------------------
+@router.post("/batch_get")
+def batch_get_tasks(request: BatchGetRequest):
+    # Keep request order, drop duplicates
+    task_ids = list(dict.fromkeys(t for t in request.task_ids if t))
+    if len(task_ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many task ids (max {BATCH_GET_MAX_IDS})",
+        )
+
+    found = {}
+    missing = []
+    generations = {}
+    for task_id in task_ids:
+        cached = get_cached_task(task_id)
+        if cached is not None:
+            found[task_id] = cached
+        else:
+            generations[task_id] = task_generation(task_id)
+            missing.append(task_id)
+
+    # Hot collection first, then the archive for whatever is still missing
+    for collection in ("tasks", ARCHIVE_COLLECTION):
+        for i in range(0, len(missing), BATCH_GET_CHUNK_SIZE):
+            chunk = missing[i:i + BATCH_GET_CHUNK_SIZE]
+            refs = [db.collection(collection).document(task_id) for task_id in chunk]
+            # get_all() does not preserve order, results are matched by id
+            for doc in db.get_all(refs):
+                if not doc.exists:
+                    continue
+                d = doc.to_dict()
+                d["id"] = doc.id
+                cache_task(doc.id, d, generations[doc.id])
+                found[doc.id] = d
+        missing = [task_id for task_id in missing if task_id not in found]
+
+    return {
+        "tasks": [found[task_id] for task_id in task_ids if task_id in found],
+        "not_found": [task_id for task_id in task_ids if task_id not in found],
+    }
+
+
 # ----------------------------
 # GET TASK BY ID
 # ----------------------------
 @router.get("/{task_id}")
 def get_task(task_id: str):
-    doc_ref = db.collection("tasks").document(task_id)
-    doc = doc_ref.get()
+    cached = get_cached_task(task_id)
+    if cached is not None:
+        return cached
+
+    generation = task_generation(task_id)
+    doc = db.collection("tasks").document(task_id).get()
+    if not doc.exists:
+        doc = db.collection(ARCHIVE_COLLECTION).document(task_id).get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
     d = doc.to_dict()
     d["id"] = doc.id
+    cache_task(task_id, d, generation)
     return d
 
 
@@ -111,9 +274,12 @@ def get_task(task_id: str):
 # ADD SUBTASK
 # ----------------------------
 @router.post("/subtask/add")
-def add_subtask(subtask: SubtaskCreate):
-    task_ref = db.collection("tasks").document(subtask.parent_task_id)
-    task = task_ref.get()
+def add_subtask(subtask: SubtaskCreate, idempotency_key: str | None = Header(default=None, alias="Idempotency-Key")):
+    return run_idempotent("add_subtask", idempotency_key, subtask.dict(), lambda: _add_subtask(subtask))
+
+
+def _add_subtask(subtask: SubtaskCreate):
+    task_ref, task, archived = _load_task_for_write(subtask.parent_task_id)
 
     if not task.exists:
         raise HTTPException(status_code=404, detail="Parent task not found")
@@ -129,7 +295,10 @@ def add_subtask(subtask: SubtaskCreate):
     task_data = task.to_dict()
     subtasks = task_data.get("subtasks", [])
     subtasks.append(new_subtask)
-    task_ref.update({"subtasks": subtasks})
+    task_data["updated_at"] = datetime.utcnow().isoformat()
+    _write_task(task_ref, archived, {"subtasks": subtasks, "updated_at": task_data["updated_at"]})
+    invalidate_task(subtask.parent_task_id)
+    upsert_task_summary(subtask.parent_task_id, task_data)
 
     return {"message": "✅ Subtask added successfully", "subtask_id": sub_id}
 
@@ -139,8 +308,7 @@ def add_subtask(subtask: SubtaskCreate):
 # ----------------------------
 @router.put("/subtask/complete/{task_id}/{subtask_id}")
 def toggle_subtask(task_id: str, subtask_id: str):
-    task_ref = db.collection("tasks").document(task_id)
-    doc = task_ref.get()
+    task_ref, doc, archived = _load_task_for_write(task_id)
 
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -164,7 +332,10 @@ def toggle_subtask(task_id: str, subtask_id: str):
         raise HTTPException(status_code=404, detail="Subtask not found")
 
     try:
-        task_ref.update({"subtasks": data["subtasks"]})
+        data["updated_at"] = datetime.utcnow().isoformat()
+        _write_task(task_ref, archived, {"subtasks": data["subtasks"], "updated_at": data["updated_at"]})
+        invalidate_task(task_id)
+        upsert_task_summary(task_id, data)
         print(f"✅ Subtask {subtask_id} updated successfully")
         return {"message": "✅ Subtask updated successfully"}
     except Exception as e:
@@ -175,8 +346,7 @@ def toggle_subtask(task_id: str, subtask_id: str):
 # ----------------------------
 @router.delete("/subtask/delete/{task_id}/{subtask_id}")
 def delete_subtask(task_id: str, subtask_id: str):
-    task_ref = db.collection("tasks").document(task_id)
-    task_doc = task_ref.get()
+    task_ref, task_doc, archived = _load_task_for_write(task_id)
 
     if not task_doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -190,7 +360,11 @@ def delete_subtask(task_id: str, subtask_id: str):
     if len(updated_subtasks) == len(subtasks):
         raise HTTPException(status_code=404, detail="Subtask not found")
 
-    task_ref.update({"subtasks": updated_subtasks})
+    task_data["subtasks"] = updated_subtasks
+    task_data["updated_at"] = datetime.utcnow().isoformat()
+    _write_task(task_ref, archived, {"subtasks": updated_subtasks, "updated_at": task_data["updated_at"]})
+    invalidate_task(task_id)
+    upsert_task_summary(task_id, task_data)
     return {"message": "✅ Subtask deleted successfully"}
 
 # ----------------------------
@@ -198,8 +372,7 @@ def delete_subtask(task_id: str, subtask_id: str):
 # ----------------------------
 @router.put("/update/{task_id}")
 def update_task(task_id: str, data: UpdateTask):
-    doc_ref = db.collection("tasks").document(task_id)
-    doc = doc_ref.get()
+    doc_ref, doc, archived = _load_task_for_write(task_id)
 
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -209,9 +382,17 @@ def update_task(task_id: str, data: UpdateTask):
     
     # Add updated timestamp
     update_data["updated_at"] = datetime.utcnow().isoformat()
+
+    # Keep completed_at in step with done, archiving keys off it
+    if update_data.get("done") is True and not doc.to_dict().get("done"):
+        update_data["completed_at"] = update_data["updated_at"]
+    elif update_data.get("done") is False:
+        update_data["completed_at"] = None
     
     try:
-        doc_ref.update(update_data)
+        _write_task(doc_ref, archived, update_data)
+        invalidate_task(task_id)
+        upsert_task_summary(task_id, doc.to_dict() | update_data)
         print(f"✅ Task {task_id} updated with: {update_data}")
         return {"message": "✅ Task updated successfully", "updated_fields": list(update_data.keys())}
     except Exception as e:
@@ -224,11 +405,15 @@ def update_task(task_id: str, data: UpdateTask):
 # ----------------------------
 @router.put("/complete/{task_id}")
 def complete_task(task_id: str):
-    doc_ref = db.collection("tasks").document(task_id)
-    if not doc_ref.get().exists:
+    doc_ref, doc, archived = _load_task_for_write(task_id)
+    if not doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    doc_ref.update({"done": True, "completed_at": datetime.utcnow().isoformat()})
+    now = datetime.utcnow().isoformat()
+    changes = {"done": True, "completed_at": now, "updated_at": now}
+    _write_task(doc_ref, archived, changes)
+    invalidate_task(task_id)
+    upsert_task_summary(task_id, doc.to_dict() | changes)
     return {"message": "✅ Task marked as complete"}
 
 
@@ -237,11 +422,23 @@ def complete_task(task_id: str):
 # ----------------------------
 @router.delete("/delete/{task_id}")
 def delete_task(task_id: str):
-    doc_ref = db.collection("tasks").document(task_id)
-    if not doc_ref.get().exists:
+    doc_ref, doc, archived = _load_task_for_write(task_id)
+    if not doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    doc_ref.delete()
+    owner_email = doc.to_dict().get("user_email")
+    # Leave a tombstone so /tasks/sync clients learn about the delete
+    db.collection("task_tombstones").document(task_id).set({
+        "task_id": task_id,
+        "user_email": owner_email,
+        "deleted_at": datetime.utcnow().isoformat(),
+    })
+    if archived:
+        db.collection(ARCHIVE_COLLECTION).document(task_id).delete()
+    else:
+        doc_ref.delete()
+    invalidate_task(task_id)
+    remove_task_summary(owner_email, task_id)
     return {"message": "🗑️ Task deleted successfully"}
 
 
@@ -249,13 +446,23 @@ def delete_task(task_id: str):
 # SHARE TASK
 # ----------------------------
 @router.post("/share_task/{task_id}")
-def share_task(task_id: str, shared_with: dict):
+def share_task(
+    task_id: str,
+    shared_with: dict,
+    idempotency_key: str | None = Header(default=None, alias="Idempotency-Key")
+):
+    return run_idempotent(
+        f"share_task:{task_id}", idempotency_key, shared_with,
+        lambda: _share_task(task_id, shared_with),
+    )
+
+
+def _share_task(task_id: str, shared_with: dict):
     shared_email = shared_with.get("shared_with")
     if not shared_email:
         raise HTTPException(status_code=400, detail="Missing 'shared_with' email")
 
-    task_ref = db.collection("tasks").document(task_id)
-    task_doc = task_ref.get()
+    task_ref, task_doc, archived = _load_task_for_write(task_id)
     if not task_doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -269,19 +476,16 @@ def share_task(task_id: str, shared_with: dict):
         return {"message": f"{shared_email} already has access to this task"}
 
     pending.append(shared_email)
-    task_ref.update({"pending_requests": pending})
+    _write_task(task_ref, archived, {"pending_requests": pending, "updated_at": datetime.utcnow().isoformat()})
+    invalidate_task(task_id)
 
     share_link = f"http://127.0.0.1:8001/tasks/request_access/{task_id}?email={shared_email}"
 
     try:
-        email_subject = f"📋 You've been invited to collaborate on '{task_data['title']}'"
-        email_message = f"""
-        <h2>TaskGuru Collaboration Invite</h2>
-        <p><b>{task_data['user_email']}</b> invited you to collaborate on <b>{task_data['title']}</b>.</p>
-        <a href="{share_link}" target="_blank">Request Access</a>
-        """
-        send_email(shared_email, email_subject, email_message)
-        print(f"✅ Invitation email sent to {shared_email}")
+        notify_email(
+            shared_email, "invite",
+            sender=task_data["user_email"], title=task_data["title"], link=share_link,
+        )
 
         notif_data = {
             "type": "invite",
@@ -294,6 +498,7 @@ def share_task(task_id: str, shared_with: dict):
             "read": False,
         }
         db.collection("notifications").add(notif_data)
+        adjust_unread(notif_data["recipient"])
 
     except Exception as e:
         print(f"⚠️ Email sending failed but task shared: {e}")
@@ -316,8 +521,7 @@ def request_task_access(
         raise HTTPException(status_code=400, detail="Missing user_email")
 
     user_email = user_email.strip().lower()
-    task_ref = db.collection("tasks").document(task_id)
-    task_doc = task_ref.get()
+    task_ref, task_doc, archived = _load_task_for_write(task_id)
     if not task_doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -332,16 +536,12 @@ def request_task_access(
         return {"message": "⏳ Request already pending"}
 
     pending.append(user_email)
-    task_ref.update({"pending_requests": pending})
+    _write_task(task_ref, archived, {"pending_requests": pending, "updated_at": datetime.utcnow().isoformat()})
+    invalidate_task(task_id)
 
     try:
         owner_email = task_data["user_email"]
-        email_subject = f"🔔 Access Request for '{title}'"
-        email_message = f"""
-        <h3>Task Access Request</h3>
-        <p><b>{user_email}</b> requested access to <b>{title}</b>.</p>
-        """
-        send_email(owner_email, email_subject, email_message)
+        notify_email(owner_email, "access_request", sender=user_email, title=title)
 
         notif_data = {
             "type": "access_request",
@@ -354,6 +554,7 @@ def request_task_access(
             "read": False,
         }
         db.collection("notifications").add(notif_data)
+        adjust_unread(notif_data["recipient"])
 
     except Exception as e:
         print(f"⚠️ Email or notification failed: {e}")
@@ -371,8 +572,7 @@ def approve_task_access(task_id: str, data: dict):
     if not approver_email or not user_email:
         raise HTTPException(status_code=400, detail="Missing emails")
 
-    task_ref = db.collection("tasks").document(task_id)
-    task_doc = task_ref.get()
+    task_ref, task_doc, archived = _load_task_for_write(task_id)
     if not task_doc.exists:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -389,15 +589,15 @@ def approve_task_access(task_id: str, data: dict):
 
     pending.remove(user_email)
     collaborators.append(user_email)
-    task_ref.update({"pending_requests": pending, "collaborators": collaborators})
+    _write_task(task_ref, archived, {
+        "pending_requests": pending,
+        "collaborators": collaborators,
+        "updated_at": datetime.utcnow().isoformat(),
+    })
+    invalidate_task(task_id)
 
     try:
-        email_subject = f"✅ Access Granted for '{title}'"
-        email_message = f"""
-        <h3>Access Approved 🎉</h3>
-        <p>{approver_email} approved your access to <b>{title}</b>.</p>
-        """
-        send_email(user_email, email_subject, email_message)
+        notify_email(user_email, "access_approved", sender=approver_email, title=title)
 
         notif_data = {
             "type": "access_approved",
@@ -410,6 +610,7 @@ def approve_task_access(task_id: str, data: dict):
             "read": False,
         }
         db.collection("notifications").add(notif_data)
+        adjust_unread(notif_data["recipient"])
 
     except Exception as e:
         print(f"⚠️ Approval email/notification failed: {e}")
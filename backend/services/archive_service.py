@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from google.cloud.firestore import FieldFilter
+from services.firebase_service import db
+from services.cache_service import invalidate_task
+from services.dashboard_service import upsert_task_summary, remove_task_summary, adjust_unread
+from collections import Counter
+import threading
+import os
+
+load_dotenv()
+
+# ----------------------------
+# RETENTION SETTINGS
+# ----------------------------
+# Completed tasks move from "tasks" to "tasks_archive" this many days after completed_at
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+# Read notifications are deleted after this many days, unread ones after NOTIFICATION_TTL_DAYS
+NOTIFICATION_READ_RETENTION_DAYS = int(os.getenv("NOTIFICATION_READ_RETENTION_DAYS", "7"))
+NOTIFICATION_TTL_DAYS = int(os.getenv("NOTIFICATION_TTL_DAYS", "90"))
+# Delete tombstones are kept this long; older /tasks/sync watermarks get a full resync
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("TOMBSTONE_RETENTION_DAYS", "90"))
+# How often the background worker runs, 0 disables it
+COMPACTION_INTERVAL_SECONDS = int(os.getenv("COMPACTION_INTERVAL_SECONDS", "3600"))
+
+ARCHIVE_COLLECTION = "tasks_archive"
+# Firestore allows 500 writes per batch; archiving costs 3 writes per task
+ARCHIVE_BATCH_SIZE = 150
+DELETE_BATCH_SIZE = 500
+
+_stop = threading.Event()
+_worker = None
+
+
+def _cutoff(days, now):
+    return (now - timedelta(days=days)).isoformat()
+
+
+def tombstone_cutoff(now=None):
+    return _cutoff(TOMBSTONE_RETENTION_DAYS, now or datetime.utcnow())
+
+
+# ----------------------------
+# COMPACTION STEPS
+# ----------------------------
+def archive_completed_tasks(now=None):
+    now = now or datetime.utcnow()
+    cutoff = _cutoff(ARCHIVE_AFTER_DAYS, now)
+    q = (
+        db.collection("tasks")
+        .where(filter=FieldFilter("done", "==", True))
+        .where(filter=FieldFilter("completed_at", "<", cutoff))
+    )
+    # Tasks written since the cutoff (e.g. restored from the archive) stay hot
+    docs = [doc for doc in q.stream() if (doc.to_dict().get("updated_at") or "") < cutoff]
+    archived_at = now.isoformat()
+
+    for i in range(0, len(docs), ARCHIVE_BATCH_SIZE):
+        batch = db.batch()
+        for doc in docs[i:i + ARCHIVE_BATCH_SIZE]:
+            data = doc.to_dict()
+            batch.set(
+                db.collection(ARCHIVE_COLLECTION).document(doc.id),
+                data | {"archived": True, "archived_at": archived_at},
+            )
+            # Sync clients drop archived tasks from their hot view
+            batch.set(db.collection("task_tombstones").document(doc.id), {
+                "task_id": doc.id,
+                "user_email": data.get("user_email"),
+                "deleted_at": archived_at,
+                "reason": "archived",
+            })
+            batch.delete(db.collection("tasks").document(doc.id))
+        batch.commit()
+
+    for doc in docs:
+        invalidate_task(doc.id)
+        remove_task_summary(doc.to_dict().get("user_email"), doc.id)
+    return len(docs)
+
+
+def restore_task(task_id, changes=None):
+    """
+    Move an archived task back into "tasks" with `changes` applied, in one
+    batch. Returns False if the task is not in the archive.
+    """
+    archive_ref = db.collection(ARCHIVE_COLLECTION).document(task_id)
+    doc = archive_ref.get()
+    if not doc.exists:
+        return False
+
+    data = doc.to_dict()
+    data.pop("archived", None)
+    data.pop("archived_at", None)
+    # A fresh updated_at lets /tasks/sync clients pick the task up again
+    data |= {"updated_at": datetime.utcnow().isoformat()} | (changes or {})
+    batch = db.batch()
+    batch.set(db.collection("tasks").document(task_id), data)
+    # The "archived" tombstone would make sync clients drop the task again
+    batch.delete(db.collection("task_tombstones").document(task_id))
+    batch.delete(archive_ref)
+    batch.commit()
+
+    invalidate_task(task_id)
+    upsert_task_summary(task_id, data)
+    print(f"📤 Task restored from archive: {task_id}")
+    return True
+
+
+def _delete_matching(query):
+    """Delete every document the query returns; returns the deleted snapshots."""
+    docs = list(query.stream())
+    for i in range(0, len(docs), DELETE_BATCH_SIZE):
+        batch = db.batch()
+        for doc in docs[i:i + DELETE_BATCH_SIZE]:
+            batch.delete(doc.reference)
+        batch.commit()
+    return docs
+
+
+def expire_notifications(now=None):
+    now = now or datetime.utcnow()
+    notifications = db.collection("notifications")
+    removed = _delete_matching(
+        notifications
+        .where(filter=FieldFilter("read", "==", True))
+        .where(filter=FieldFilter("created_at", "<", _cutoff(NOTIFICATION_READ_RETENTION_DAYS, now)))
+    )
+    expired = _delete_matching(
+        notifications.where(filter=FieldFilter("created_at", "<", _cutoff(NOTIFICATION_TTL_DAYS, now)))
+    )
+
+    # Keep the dashboard unread counters in step with expired unread notifications
+    unread = Counter(
+        d.get("recipient") for d in (doc.to_dict() for doc in expired) if not d.get("read")
+    )
+    for recipient, count in unread.items():
+        adjust_unread(recipient, -count)
+    return len(removed) + len(expired)
+
+
+def expire_tombstones(now=None):
+    return len(_delete_matching(
+        db.collection("task_tombstones")
+        .where(filter=FieldFilter("deleted_at", "<", tombstone_cutoff(now)))
+    ))
+
+
+def compact(now=None):
+    """Run every compaction step once and return what was moved/removed."""
+    now = now or datetime.utcnow()
+    result = {
+        "archived_tasks": archive_completed_tasks(now),
+        "expired_notifications": expire_notifications(now),
+        "expired_tombstones": expire_tombstones(now),
+    }
+    print(f"🧹 Compaction finished: {result}")
+    return result
+
+
+# ----------------------------
+# BACKGROUND WORKER
+# ----------------------------
+def _run_worker():
+    while not _stop.wait(COMPACTION_INTERVAL_SECONDS):
+        try:
+            compact()
+        except Exception as e:
+            print(f"❌ Compaction failed: {e}")
+
+
+def start_compaction_worker():
+    global _worker
+    if COMPACTION_INTERVAL_SECONDS <= 0 or (_worker and _worker.is_alive()):
+        return
+    _stop.clear()
+    _worker = threading.Thread(target=_run_worker, name="compaction", daemon=True)
+    _worker.start()
+    print(f"🧹 Compaction worker started (every {COMPACTION_INTERVAL_SECONDS}s)")
+
+
+def stop_compaction_worker():
+    _stop.set()
@@ -0,0 +1,56 @@
+from cachetools import TTLCache
+from threading import Lock
+import itertools
+import copy
+import os
+
+# ----------------------------
+# TASK CACHE
+# ----------------------------
+# Short-lived, in-process cache of task documents keyed by task_id.
+# Every write handler in routers/tasks.py invalidates the entry it touches.
+# Readers take a generation token before reading Firestore and pass it to
+# cache_task(), which skips the fill if the task was invalidated meanwhile,
+# so a slow read can't re-cache data older than a local write. The TTL
+# bounds staleness for writes made by other processes.
+TASK_CACHE_SIZE = int(os.getenv("TASK_CACHE_SIZE", "1024"))
+TASK_CACHE_TTL = int(os.getenv("TASK_CACHE_TTL", "30"))
+# Invalidation generations only need to outlive an in-flight read
+GENERATION_TTL = 300
+
+_task_cache = TTLCache(maxsize=TASK_CACHE_SIZE, ttl=TASK_CACHE_TTL)
+_generations = TTLCache(maxsize=TASK_CACHE_SIZE * 10, ttl=GENERATION_TTL)
+_generation_counter = itertools.count(1)
+_lock = Lock()
+
+
+def task_generation(task_id):
+    """Token to take before reading a task from Firestore, see cache_task()."""
+    with _lock:
+        return _generations.get(task_id)
+
+
+def get_cached_task(task_id):
+    """Return a copy of the cached task dict, or None on a miss."""
+    with _lock:
+        task = _task_cache.get(task_id)
+    return copy.deepcopy(task) if task is not None else None
+
+
+def cache_task(task_id, task, generation):
+    with _lock:
+        # Invalidated after the read started: the data may predate that write
+        if _generations.get(task_id) != generation:
+            return
+        _task_cache[task_id] = copy.deepcopy(task)
+
+
+def invalidate_task(task_id):
+    with _lock:
+        _task_cache.pop(task_id, None)
+        _generations[task_id] = next(_generation_counter)
+
+
+def clear_task_cache():
+    with _lock:
+        _task_cache.clear()
@@ -0,0 +1,186 @@
+from datetime import datetime
+from google.api_core.exceptions import Conflict, FailedPrecondition, NotFound
+from google.cloud import firestore
+from google.cloud.firestore import FieldFilter
+from services.firebase_service import db
+
+# ----------------------------
+# MATERIALIZED DASHBOARD VIEW
+# ----------------------------
+# One document per user in "dashboards" (keyed by email) holding task
+# summaries and the unread notification count. Task and notification
+# writers keep it current; GET /dashboard serves it with one keyed read.
+# A document without "built" (e.g. created by a write before the first
+# dashboard load) is rebuilt from the source collections on read.
+DASHBOARD_COLLECTION = "dashboards"
+# Rebuilds that lose a race with a concurrent incremental write start over
+DASHBOARD_REBUILD_ATTEMPTS = 3
+
+SUMMARY_FIELDS = ("title", "priority", "due_date", "done", "created_at", "updated_at", "completed_at")
+
+
+def _dashboard_ref(email):
+    # Keyed like "users": task and notification writers pass emails as stored
+    return db.collection(DASHBOARD_COLLECTION).document(email.strip().lower())
+
+
+def task_summary(task_data):
+    subtasks = task_data.get("subtasks") or []
+    summary = {field: task_data.get(field) for field in SUMMARY_FIELDS}
+    summary["subtasks_total"] = len(subtasks)
+    summary["subtasks_done"] = sum(1 for s in subtasks if s.get("done"))
+    return summary
+
+
+# ----------------------------
+# INCREMENTAL UPDATES
+# ----------------------------
+# Failures are logged, never raised: the source write already succeeded.
+# The view is dropped instead so the next GET /dashboard rebuilds it.
+def _discard_view(email, error):
+    print(f"⚠️ Dashboard update failed for {email}: {error}")
+    try:
+        _dashboard_ref(email).delete()
+    except Exception as e:
+        print(f"⚠️ Could not discard stale dashboard for {email}: {e}")
+
+
+def upsert_task_summary(task_id, task_data):
+    email = task_data.get("user_email")
+    if not email:
+        return
+    try:
+        _dashboard_ref(email).set({
+            "tasks": {task_id: task_summary(task_data)},
+            "updated_at": datetime.utcnow().isoformat(),
+        }, merge=True)
+    except Exception as e:
+        _discard_view(email, e)
+
+
+def remove_task_summary(email, task_id):
+    if not email:
+        return
+    try:
+        _dashboard_ref(email).set({
+            "tasks": {task_id: firestore.DELETE_FIELD},
+            "updated_at": datetime.utcnow().isoformat(),
+        }, merge=True)
+    except Exception as e:
+        _discard_view(email, e)
+
+
+def adjust_unread(email, delta=1):
+    if not email or not delta:
+        return
+    try:
+        _dashboard_ref(email).set({
+            "unread_notifications": firestore.Increment(delta),
+            "updated_at": datetime.utcnow().isoformat(),
+        }, merge=True)
+    except Exception as e:
+        _discard_view(email, e)
+
+
+def set_dashboard_user(user_id, user_data):
+    """Record a newly registered user on a view that may predate them."""
+    email = user_data.get("email")
+    if not email:
+        return
+    try:
+        _dashboard_ref(email).set({
+            "user": {"id": user_id, "email": email, "created_at": user_data.get("created_at")},
+            "updated_at": datetime.utcnow().isoformat(),
+        }, merge=True)
+    except Exception as e:
+        _discard_view(email, e)
+
+
+# ----------------------------
+# READ / REBUILD
+# ----------------------------
+def _build_view(email):
+    tasks = {}
+    for t in db.collection("tasks").where(filter=FieldFilter("user_email", "==", email)).stream():
+        tasks[t.id] = task_summary(t.to_dict())
+
+    unread = sum(1 for _ in (
+        db.collection("notifications")
+        .where(filter=FieldFilter("recipient", "==", email))
+        .where(filter=FieldFilter("read", "==", False))
+        .stream()
+    ))
+
+    user = None
+    for u in db.collection("users").where(filter=FieldFilter("email", "==", email)).stream():
+        data = u.to_dict()
+        user = {"id": u.id, "email": data.get("email"), "created_at": data.get("created_at")}
+        break
+
+    return {
+        "email": email,
+        "user": user,
+        "tasks": tasks,
+        "unread_notifications": unread,
+        "built": True,
+        "updated_at": datetime.utcnow().isoformat(),
+    }
+
+
+def rebuild_dashboard(email):
+    """
+    Recompute the view from the source collections and store it, unless an
+    incremental write landed on it meanwhile (that attempt is then redone).
+    """
+    email = email.strip().lower()
+    ref = _dashboard_ref(email)
+    for _ in range(DASHBOARD_REBUILD_ATTEMPTS):
+        before = ref.get()
+        view = _build_view(email)
+        try:
+            if before.exists:
+                ref.update(view, option=db.write_option(last_update_time=before.update_time))
+            else:
+                ref.create(view)
+        except (Conflict, FailedPrecondition, NotFound):
+            continue
+        print(f"📊 Dashboard rebuilt for {email} ({len(view['tasks'])} tasks)")
+        return view
+
+    # Still contended: serve the fresh view and let a later read store it
+    print(f"⚠️ Dashboard for {email} kept changing during rebuild, not stored")
+    return view
+
+
+def dashboard_stats(tasks):
+    # Stored timestamps and due dates are UTC
+    today = datetime.utcnow().date().isoformat()
+    done = sum(1 for t in tasks.values() if t.get("done"))
+    overdue = sum(
+        1 for t in tasks.values()
+        if not t.get("done") and t.get("due_date") and t["due_date"][:10] < today
+    )
+    return {"total": len(tasks), "done": done, "open": len(tasks) - done, "overdue": overdue}
+
+
+def get_dashboard(email):
+    email = email.strip().lower()
+    doc = _dashboard_ref(email).get()
+    view = doc.to_dict() if doc.exists else None
+    if not view or not view.get("built"):
+        view = rebuild_dashboard(email)
+
+    tasks = view.get("tasks") or {}
+    task_list = sorted(
+        ({"id": task_id, **summary} for task_id, summary in tasks.items()),
+        key=lambda t: t.get("created_at") or "",
+        reverse=True,
+    )
+    return {
+        "email": email,
+        "user": view.get("user"),
+        "tasks": task_list,
+        "unread_notifications": max(0, view.get("unread_notifications") or 0),
+        "stats": dashboard_stats(tasks),
+        "updated_at": view.get("updated_at"),
+    }
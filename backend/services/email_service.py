@@ -2,42 +2,230 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
+from string import Template
+from html import escape
+import threading
+import time
 import os
 
 # Load environment variables
 load_dotenv()
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+# Disable for a local relay or test sink that speaks plain SMTP without auth
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
 SENDER_EMAIL = os.getenv("SENDER_EMAIL")
 SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
 
+# Collaboration emails are collected per recipient for this many seconds and
+# sent as one digest. 0 sends each event immediately.
+EMAIL_DIGEST_WINDOW_SECONDS = int(os.getenv("EMAIL_DIGEST_WINDOW_SECONDS", "0"))
+# A digest that fails this many flushes in a row is logged and dropped
+DIGEST_MAX_ATTEMPTS = int(os.getenv("DIGEST_MAX_ATTEMPTS", "3"))
+
+
+# ----------------------------
+# TEMPLATES
+# ----------------------------
+# Compiled once at import. "line" is the event's entry inside a digest.
+EVENT_TEMPLATES = {
+    "invite": {
+        "subject": Template("📋 You've been invited to collaborate on '$title'"),
+        "body": Template("""
+        <h2>TaskGuru Collaboration Invite</h2>
+        <p><b>$sender</b> invited you to collaborate on <b>$title</b>.</p>
+        <a href="$link" target="_blank">Request Access</a>
+        """),
+        "line": Template(
+            '<li><b>$sender</b> invited you to collaborate on <b>$title</b> '
+            '(<a href="$link" target="_blank">Request Access</a>)</li>'
+        ),
+    },
+    "access_request": {
+        "subject": Template("🔔 Access Request for '$title'"),
+        "body": Template("""
+        <h3>Task Access Request</h3>
+        <p><b>$sender</b> requested access to <b>$title</b>.</p>
+        """),
+        "line": Template("<li><b>$sender</b> requested access to <b>$title</b></li>"),
+    },
+    "access_approved": {
+        "subject": Template("✅ Access Granted for '$title'"),
+        "body": Template("""
+        <h3>Access Approved 🎉</h3>
+        <p>$sender approved your access to <b>$title</b>.</p>
+        """),
+        "line": Template("<li>$sender approved your access to <b>$title</b></li>"),
+    },
+}
+
+DIGEST_SUBJECT = Template("🔔 $count new TaskGuru updates")
+DIGEST_BODY = Template("""
+        <h2>Your TaskGuru updates</h2>
+        <ul>
+        $items
+        </ul>
+        """)
+
+
+def render_event(event_type: str, **fields):
+    """Return (subject, html_body, digest_line) for a collaboration event."""
+    templates = EVENT_TEMPLATES[event_type]
+    subject = templates["subject"].substitute(fields)
+    safe = {k: escape(str(v)) for k, v in fields.items()}
+    return subject, templates["body"].substitute(safe), templates["line"].substitute(safe)
+
+
+# ----------------------------
+# SMTP DELIVERY
+# ----------------------------
+def _build_message(to_email: str, subject: str, message: str):
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = SENDER_EMAIL
+    msg["To"] = to_email
+
+    html_part = MIMEText(message, "html", "utf-8")
+    msg.attach(html_part)
+    return msg
 
-def send_email(to_email: str, subject: str, message: str):
-    print(f"📧 send_email called → to={to_email}, from={SENDER_EMAIL}")
 
+def send_emails(messages):
+    """
+    Send [(to_email, subject, html), ...] over a single SMTP connection.
+    Returns the messages that could not be sent; one refused recipient
+    does not stop the others.
+    """
+    if not messages:
+        return []
     if not SENDER_EMAIL or not SENDER_PASSWORD:
         print("❌ Missing SENDER_EMAIL or SENDER_PASSWORD in .env")
-        return
+        return list(messages)
 
+    failed = []
+    remaining = list(messages)
     try:
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = SENDER_EMAIL
-        msg["To"] = to_email
-
-        html_part = MIMEText(message, "html", "utf-8")
-        msg.attach(html_part)
-
         with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.Login(SENDER_EMAIL, SENDER_PASSWORD)
-            server.send_message(msg)
-
-        print(f"✅ Email sent successfully to {to_email}")
+            if SMTP_STARTTLS:
+                server.starttls()
+                server.login(SENDER_EMAIL, SENDER_PASSWORD)
+            while remaining:
+                to_email, subject, message = remaining[0]
+                try:
+                    server.send_message(_build_message(to_email, subject, message))
+                    print(f"✅ Email sent successfully to {to_email}")
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError, smtplib.SMTPSenderRefused) as e:
+                    # Rejected message, the connection is still usable
+                    print(f"❌ Email sending failed for {to_email}: {e}")
+                    failed.append(remaining[0])
+                remaining.pop(0)
 
     except Exception as e:
+        # Connection-level failure: nothing left in `remaining` went out
         print(f"❌ Email sending failed: {e}")
+        failed.extend(remaining)
+    return failed
+
+
+def send_email(to_email: str, subject: str, message: str):
+    print(f"📧 send_email called → to={to_email}, from={SENDER_EMAIL}")
+    return not send_emails([(to_email, subject, message)])
+
+
+# ----------------------------
+# DIGESTS
+# ----------------------------
+_pending = {}  # recipient -> {"since": monotonic time, "attempts": n, "events": [(subject, body, line)]}
+_pending_lock = threading.Lock()
+_flusher = None
+
+
+def notify_email(recipient: str, event_type: str, **fields):
+    """
+    Email a collaboration event. Sent immediately when digests are off,
+    otherwise queued and folded into the recipient's next digest.
+    """
+    rendered = render_event(event_type, **fields)
+    if EMAIL_DIGEST_WINDOW_SECONDS <= 0:
+        send_email(recipient, rendered[0], rendered[1])
+        return
+
+    with _pending_lock:
+        entry = _pending.setdefault(recipient, {"since": time.monotonic(), "attempts": 0, "events": []})
+        entry["events"].append(rendered)
+    print(f"📥 Queued '{event_type}' email for {recipient} digest")
+    _ensure_flusher()
+
+
+def _digest_message(recipient, events):
+    if len(events) == 1:
+        subject, body, _ = events[0]
+        return recipient, subject, body
+    items = "\n        ".join(line for _, _, line in events)
+    return (
+        recipient,
+        DIGEST_SUBJECT.substitute(count=len(events)),
+        DIGEST_BODY.substitute(items=items),
+    )
+
+
+def _requeue(recipient, entry):
+    """Put a digest that failed to send back in front of newer events."""
+    entry["attempts"] += 1
+    if entry["attempts"] >= DIGEST_MAX_ATTEMPTS:
+        print(f"❌ Dropping digest for {recipient} after {entry['attempts']} failed attempts "
+              f"({len(entry['events'])} events)")
+        return
+    newer = _pending.get(recipient)
+    if newer:
+        entry["events"] += newer["events"]
+    _pending[recipient] = entry
+    print(f"🔁 Digest for {recipient} re-queued (attempt {entry['attempts']})")
+
+
+def flush_digests(force: bool = False):
+    """
+    Send every digest whose window has elapsed (all of them if force).
+    Failed digests are re-queued; returns how many were sent.
+    """
+    now = time.monotonic()
+    with _pending_lock:
+        due = [
+            r for r, entry in _pending.items()
+            if force or now - entry["since"] >= EMAIL_DIGEST_WINDOW_SECONDS
+        ]
+        batches = {r: _pending.pop(r) for r in due}
+
+    failed = send_emails([_digest_message(r, entry["events"]) for r, entry in batches.items()])
+    failed_recipients = {to_email for to_email, _, _ in failed}
+    if failed_recipients:
+        with _pending_lock:
+            for r in failed_recipients:
+                _requeue(r, batches[r])
+    return len(batches) - len(failed_recipients)
+
+
+def _run_flusher():
+    # Check a few times per window so digests go out close to their deadline
+    interval = max(1, EMAIL_DIGEST_WINDOW_SECONDS / 4)
+    while True:
+        time.sleep(interval)
+        try:
+            flush_digests()
+        except Exception as e:
+            print(f"❌ Digest flush failed: {e}")
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher and _flusher.is_alive():
+        return
+    with _pending_lock:
+        if _flusher and _flusher.is_alive():
+            return
+        _flusher = threading.Thread(target=_run_flusher, name="email-digest", daemon=True)
+        _flusher.start()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,89 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+from cachetools import TTLCache
+from threading import Event, Lock
+import hashlib
+import json
+import copy
+import os
+
+# ----------------------------
+# IDEMPOTENCY KEYS
+# ----------------------------
+# Responses of write endpoints called with an "Idempotency-Key" header are
+# kept in a bounded, TTL-expiring in-process cache. A retry with the same key
+# replays the stored response instead of repeating the write (and email).
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a retry waits for the first request with the same key to finish
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+
+_responses = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL_SECONDS)
+_lock = Lock()
+
+
+class _Entry:
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.finished = Event()
+        self.result = None
+        self.succeeded = False
+
+
+def _fingerprint(payload):
+    raw = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _replay(result):
+    headers = {"Idempotent-Replayed": "true"}
+    if isinstance(result, Response):
+        return Response(
+            content=result.body,
+            status_code=result.status_code,
+            media_type=result.media_type,
+            headers=headers,
+        )
+    return JSONResponse(content=copy.deepcopy(result), headers=headers)
+
+
+def run_idempotent(scope: str, key: str | None, payload, handler):
+    """
+    Run handler() once per (scope, key). Without a key the handler just runs.
+    Reusing a key with a different payload is rejected with 422; a retry that
+    arrives while the first request is still running waits for its result.
+    """
+    if not key:
+        return handler()
+
+    fingerprint = _fingerprint(payload)
+    cache_key = (scope, key)
+    with _lock:
+        entry = _responses.get(cache_key)
+        owner = entry is None
+        if owner:
+            entry = _Entry(fingerprint)
+            _responses[cache_key] = entry
+
+    if not owner:
+        if entry.fingerprint != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if not entry.finished.wait(IDEMPOTENCY_WAIT_SECONDS):
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        if not entry.succeeded:
+            raise HTTPException(status_code=409, detail="The original request with this Idempotency-Key failed, retry it")
+        print(f"♻️ Replaying {scope} response for Idempotency-Key {key}")
+        return _replay(entry.result)
+
+    try:
+        entry.result = handler()
+        entry.succeeded = True
+        return entry.result
+    except Exception:
+        # Failed attempts are not remembered so the client can retry them
+        with _lock:
+            if _responses.get(cache_key) is entry:
+                del _responses[cache_key]
+        raise
+    finally:
+        entry.finished.set()
@@ -0,0 +1,231 @@
+from fastapi.routing import APIRoute
+from collections import Counter, deque
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from datetime import datetime
+import functools
+import hmac
+import inspect
+import threading
+import random
+import time
+import uuid
+import sys
+import os
+
+load_dotenv()
+
+# ----------------------------
+# SETTINGS
+# ----------------------------
+# Requests carrying "X-Profile: <PROFILE_ADMIN_TOKEN>" are always profiled;
+# PROFILE_SAMPLE_RATE (0.0-1.0) profiles a random share of all requests.
+# The token also guards /admin/profiles, so without it nothing is profiled:
+# no middleware is installed and routes are not wrapped.
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN") or None
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+
+PROFILING_ENABLED = bool(PROFILE_ADMIN_TOKEN)
+if PROFILE_SAMPLE_RATE > 0 and not PROFILE_ADMIN_TOKEN:
+    print("⚠️ PROFILE_SAMPLE_RATE is set but PROFILE_ADMIN_TOKEN is not; "
+          "profiling stays off because /admin/profiles could not be read")
+
+# Leaf-most matching frame decides which phase a stack sample belongs to.
+# Only the endpoint body is sampled; building the response after it returns
+# is timed separately as "serialization" by ProfiledRoute.
+PHASES = (
+    ("firestore", ("google/cloud/firestore", "google/api_core", "google/auth", "grpc")),
+    ("smtp", ("smtplib", "/email/")),
+)
+
+_active_profile = ContextVar("active_profile", default=None)
+_profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+
+
+class RequestProfile:
+    def __init__(self, method, path, reason):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = datetime.utcnow().isoformat()
+        self.stacks = Counter()
+        self.phase_samples = Counter()
+        self.handler_ms = 0.0
+        self.handler_done = None
+        self.serialization_ms = 0.0
+        self.total_ms = 0.0
+        self.status_code = None
+
+    def summary(self):
+        total_samples = sum(self.phase_samples.values())
+        phases_ms = {
+            phase: round(self.handler_ms * count / total_samples, 3)
+            for phase, count in self.phase_samples.items()
+        } if total_samples else {}
+        phases_ms["serialization"] = round(self.serialization_ms, 3)
+        # Middleware, routing and request validation
+        phases_ms["outside_handler"] = round(
+            max(0.0, self.total_ms - self.handler_ms - self.serialization_ms), 3
+        )
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "total_ms": round(self.total_ms, 3),
+            "handler_ms": round(self.handler_ms, 3),
+            "samples": total_samples,
+            "phases_ms": phases_ms,
+        }
+
+    def folded(self):
+        """Stacks in collapsed format, ready for flamegraph.pl or speedscope."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+# ----------------------------
+# SAMPLER
+# ----------------------------
+def _classify(frames):
+    for frame in reversed(frames):
+        filename = frame.f_code.co_filename.replace("\\", "/")
+        for phase, markers in PHASES:
+            if any(m in filename for m in markers):
+                return phase
+    return "app"
+
+
+def _sample(profile, thread_id, stop, root_code):
+    interval = PROFILE_INTERVAL_MS / 1000.0
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        frames = []
+        while frame is not None and frame.f_code is not root_code:
+            frames.append(frame)
+            frame = frame.f_back
+        if not frames:
+            continue
+        frames.reverse()
+        profile.stacks[";".join(
+            f"{f.f_code.co_name} ({os.path.basename(f.f_code.co_filename)}:{f.f_lineno})"
+            for f in frames
+        )] += 1
+        profile.phase_samples[_classify(frames)] += 1
+
+
+def _profiled_call(profile, fn, root_code, *args, **kwargs):
+    stop = threading.Event()
+    sampler = threading.Thread(
+        target=_sample, args=(profile, threading.get_ident(), stop, root_code), daemon=True
+    )
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        stop.set()
+        sampler.join()
+        profile.handler_done = time.perf_counter()
+        profile.handler_ms += (profile.handler_done - start) * 1000
+
+
+def profiled_endpoint(fn):
+    """Sample the endpoint's own thread while a profile is active for the request."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = _active_profile.get()
+        if profile is None:
+            return fn(*args, **kwargs)
+        return _profiled_call(profile, fn, _profiled_call.__code__, *args, **kwargs)
+    wrapper.is_profiled = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute that wraps sync endpoints for profiling when it is enabled."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        # include_router() rebuilds routes from already-wrapped endpoints
+        if (
+            PROFILING_ENABLED
+            and not inspect.iscoroutinefunction(endpoint)
+            and not getattr(endpoint, "is_profiled", False)
+        ):
+            endpoint = profiled_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not PROFILING_ENABLED:
+            return handler
+
+        async def timed_handler(request):
+            response = await handler(request)
+            # Between the endpoint returning and here FastAPI only validates,
+            # encodes and renders the return value
+            profile = _active_profile.get()
+            if profile is not None and profile.handler_done is not None:
+                profile.serialization_ms += (time.perf_counter() - profile.handler_done) * 1000
+            return response
+        return timed_handler
+
+
+# ----------------------------
+# MIDDLEWARE
+# ----------------------------
+def token_matches(candidate):
+    """Constant-time check of a client-supplied token against PROFILE_ADMIN_TOKEN."""
+    if not PROFILE_ADMIN_TOKEN or not candidate:
+        return False
+    return hmac.compare_digest(candidate.encode("utf-8"), PROFILE_ADMIN_TOKEN.encode("utf-8"))
+
+
+def _profile_reason(request):
+    if token_matches(request.headers.get("X-Profile")):
+        return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+async def profiling_middleware(request, call_next):
+    reason = _profile_reason(request)
+    if reason is None:
+        return await call_next(request)
+
+    profile = RequestProfile(request.method, request.url.path, reason)
+    token = _active_profile.set(profile)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _active_profile.reset(token)
+        profile.total_ms = (time.perf_counter() - start) * 1000
+
+    profile.status_code = response.status_code
+    with _profiles_lock:
+        _profiles.append(profile)
+    response.headers["X-Profile-Id"] = profile.id
+    return response
+
+
+# ----------------------------
+# RING BUFFER ACCESS
+# ----------------------------
+def list_profiles():
+    with _profiles_lock:
+        return [p.summary() for p in reversed(_profiles)]
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        for p in _profiles:
+            if p.id == profile_id:
+                return p
+    return None